@@ -1,11 +1,25 @@
 import urllib.parse
-import re
+import functools
+
+temp_folder = '/home/data/battykoda/tempdata/'
 
 
 def appropriate_file(path, args, osfolder, folder_only=False):
-    folder = osfolder + '/home/data/battykoda/tempdata/' + '/'.join(path.split('/')[:-1])
+    return _appropriate_file(path, tuple(args.items()), osfolder, folder_only)
+
+
+def _encode(args):
+    # same as urlencode with '&' and '=' turned into '_'; values are still quoted
+    # because they come straight from the query string
+    return '_'.join(urllib.parse.quote_plus(str(key)) + '_' + urllib.parse.quote_plus(str(value))
+                    for key, value in args)
+
+
+@functools.lru_cache(maxsize=4096)
+def _appropriate_file(path, args, osfolder, folder_only):
+    folder_path, _, filename = path.rpartition('/')
+    folder = osfolder + temp_folder + folder_path
 
     if folder_only:
         return folder
-    return folder + '/' + re.sub('[?&=]', '_',  urllib.parse.urlencode(args)) + path.split('/')[-1]
-
+    return folder + '/' + _encode(args) + filename
@@ -3,37 +3,192 @@ import numpy as np
 from scipy.io import wavfile
 import time
 import hashlib
+import json
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class MatSignal:
+    # channels-first HDF5 dataset seen as (samples, channels); only the rows asked for are read from disk
+    def __init__(self, dataset):
+        self.dataset = dataset
+        self.shape = dataset.shape[::-1]
+        self.ndim = dataset.ndim
+        self.size = dataset.size
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        rows, columns = key if isinstance(key, tuple) else (key, slice(None))
+        return np.ascontiguousarray(self.dataset[columns, rows].T)
+
 
 class DataReader:
-    cache = dict()
+    # least recently used first; bounded by age and by the bytes of audio actually held in memory
+    cache = OrderedDict()
+    cache_lock = threading.Lock()
+    cache_ttl = 300
+    cache_max_bytes = 2 ** 32
+    hash_blocksize = 2 ** 20
+    std_blocksize = 2 ** 18
+    # folder for the per-file hash and scale sidecars that outlive the process; None disables them
+    disk_cache_folder = None
+    # warms the cache with the next recording in the folder while the user works on this one
+    prefetcher = ThreadPoolExecutor(max_workers=2)
+    prefetching = set()
+    prefetch_depth = 2
+
     @classmethod
-    def data_read(cls, path_to_file):
+    def hash_read(cls, path_to_file):
+        hasher = hashlib.md5()
+        with open(path_to_file, 'rb') as datafile:
+            try:
+                # hash straight from the page cache, without copying into read() buffers
+                with mmap.mmap(datafile.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    hasher.update(mapped)
+            except (ValueError, OSError):
+                # empty files and filesystems without mmap support
+                for block in iter(lambda: datafile.read(cls.hash_blocksize), b''):
+                    hasher.update(block)
+        return hasher.hexdigest()
 
-        if path_to_file in cls.cache and time.time() - cls.cache[path_to_file]['time'] < 300:
-                fs = cls.cache[path_to_file]['fs']
-                audiodata = cls.cache[path_to_file]['audiodata']
-                hashof = cls.cache[path_to_file]['hashof']
-        else:
-            hashof = hashlib.md5(open(path_to_file, 'rb').read()).hexdigest()
-            if path_to_file.endswith('.mat'):
-                datafile = h5py.File(path_to_file)
-                audiodata = np.array(datafile['sig']).T
-                fs = 250000
-            else:
-                fs, audiodata = wavfile.read(path_to_file)
-            if len(audiodata.shape) == 1:
-                audiodata = audiodata.reshape([-1, 1]).repeat(3, axis=1)
-            audiodata = audiodata.astype(float)
-            audiodata /= np.std(audiodata)
-            cls.cache[path_to_file] = {'time': time.time(),
-                                       'fs': fs,
-                                       'audiodata': audiodata,
-                                       'hashof': hashof}
+    @classmethod
+    def std_read(cls, audiodata):
+        # one pass over the samples, a block at a time, so a memmap is never fully copied to float
+        total = 0.0
+        total_sq = 0.0
+        for start in range(0, len(audiodata), cls.std_blocksize):
+            block = audiodata[start:start + cls.std_blocksize].astype(float)
+            total += np.add.reduce(block, axis=None)
+            total_sq += np.add.reduce(np.square(block, out=block), axis=None)
+        mean = total / audiodata.size
+        return np.sqrt(max(total_sq / audiodata.size - mean * mean, 0.0))
 
+    @classmethod
+    def stats_read(cls, path_to_file, audiodata, stat):
+        sidecar = None
+        if cls.disk_cache_folder is not None:
+            sidecar = os.path.join(cls.disk_cache_folder, hashlib.md5(path_to_file.encode()).hexdigest() + '.json')
+            try:
+                with open(sidecar) as sfile:
+                    stats = json.load(sfile)
+                if stats['size'] == stat.st_size and stats['mtime_ns'] == stat.st_mtime_ns:
+                    return stats['hashof'], stats['scale']
+            except (OSError, ValueError, KeyError):
+                pass
+        hashof = cls.hash_read(path_to_file)
+        std = cls.std_read(audiodata)
+        scale = 1 / float(std) if std > 0 else 1.0
+        if sidecar is not None:
+            partial = sidecar + '.' + str(os.getpid()) + '.' + str(threading.get_ident())
+            try:
+                os.makedirs(cls.disk_cache_folder, exist_ok=True)
+                with open(partial, 'w') as sfile:
+                    json.dump({'size': stat.st_size,
+                               'mtime_ns': stat.st_mtime_ns,
+                               'hashof': hashof,
+                               'scale': scale}, sfile)
+                os.replace(partial, sidecar)
+            except OSError:
+                pass
+        return hashof, scale
+
+    @classmethod
+    def resident_bytes(cls, audiodata):
+        # memory-mapped WAVs and MatSignal views hold no samples themselves; a broadcast mono view holds
+        # only the single channel underneath it
+        if not isinstance(audiodata, np.ndarray):
+            return 0
+        owner = audiodata
+        while isinstance(owner.base, np.ndarray):
+            owner = owner.base
+        return 0 if isinstance(owner, np.memmap) else owner.nbytes
 
+    @classmethod
+    def cache_evict(cls):
+        now = time.monotonic()
+        for key in [key for key, entry in cls.cache.items() if now - entry['time'] >= cls.cache_ttl]:
+            del cls.cache[key]
+        total = sum(entry['nbytes'] for entry in cls.cache.values())
+        while total > cls.cache_max_bytes and len(cls.cache) > 1:
+            _, entry = cls.cache.popitem(last=False)
+            total -= entry['nbytes']
 
+    @classmethod
+    def prefetch_next(cls, path_to_file):
+        # the folder listing happens in the prefetch thread, not on the request
+        with cls.cache_lock:
+            if path_to_file in cls.prefetching or len(cls.prefetching) >= cls.prefetch_depth:
+                return
+            cls.prefetching.add(path_to_file)
+        cls.prefetcher.submit(cls.prefetch_read, path_to_file)
 
-        return audiodata, fs, hashof
+    @classmethod
+    def prefetch_read(cls, path_to_file):
+        try:
+            folder, name = os.path.split(path_to_file)
+            try:
+                names = os.listdir(folder)
+            except OSError:
+                return
+            siblings = set(names)
+            following = [item for item in names
+                         if item > name and item.endswith(('.wav', '.mat')) and item + '.pickle' in siblings]
+            if not following:
+                return
+            next_path = os.path.join(folder, min(following))
+            with cls.cache_lock:
+                if next_path in cls.cache:
+                    return
+            cls.data_read(next_path, prefetch=False)
+        finally:
+            with cls.cache_lock:
+                cls.prefetching.discard(path_to_file)
 
+    @classmethod
+    def data_read(cls, path_to_file, prefetch=True):
+        stat = os.stat(path_to_file)
+        version = (stat.st_size, stat.st_mtime_ns)
+        with cls.cache_lock:
+            entry = cls.cache.get(path_to_file)
+            if (entry is not None and entry['version'] == version
+                    and time.monotonic() - entry['time'] < cls.cache_ttl):
+                cls.cache.move_to_end(path_to_file)
+                return entry['audiodata'], entry['fs'], entry['hashof'], entry['scale']
 
+        if path_to_file.endswith('.mat'):
+            datafile = h5py.File(path_to_file, 'r')
+            if datafile['sig'].ndim == 2:
+                audiodata = MatSignal(datafile['sig'])
+            else:
+                audiodata = np.array(datafile['sig'])
+            fs = 250000
+        else:
+            try:
+                fs, audiodata = wavfile.read(path_to_file, mmap=True)
+            except ValueError:
+                # 24-bit and some compressed WAVs cannot be memory-mapped
+                fs, audiodata = wavfile.read(path_to_file)
+        # samples stay as stored on disk; callers normalize the slice they use
+        hashof, scale = cls.stats_read(path_to_file, audiodata, stat)
+        if audiodata.ndim == 1:
+            # read-only view with stride 0 across the channels, no copy of the samples
+            audiodata = np.broadcast_to(audiodata.reshape([-1, 1]), (audiodata.shape[0], 3))
+        with cls.cache_lock:
+            cls.cache[path_to_file] = {'time': time.monotonic(),
+                                       'version': version,
+                                       'fs': fs,
+                                       'audiodata': audiodata,
+                                       'nbytes': cls.resident_bytes(audiodata),
+                                       'hashof': hashof,
+                                       'scale': scale}
+            cls.cache.move_to_end(path_to_file)
+            cls.cache_evict()
+        if prefetch:
+            cls.prefetch_next(path_to_file)
 
+        return audiodata, fs, hashof, scale
@@ -1,26 +1,64 @@
 import os
+import functools
 import htmlGenerator
-from flask import render_template, Markup
+from flask import current_app, Markup, Response, stream_with_context
 
+_LINK_ITEM = '<li><a href="%s/">%s</a></li>'
+_PLAIN_ITEM = '<li>%s</li>'
+# folders with more entries than this are streamed to the browser in batches
+_STREAM_THRESHOLD = 500
+_STREAM_BATCH = 256
 
-def file_list(osfolder, path):
-    list_of_files = os.listdir(osfolder + path)
-    list_of_files.sort()
-    collect_files = ''
-    for item in list_of_files:
-        if '.git' in item:
-            continue
-        if path == 'home/' and item.endswith('lost+found'):
-            continue
-        if path == 'home/' and item.endswith('data'):
+
+@functools.lru_cache(maxsize=2)
+def _template(name):
+    # listBK.html only uses data, so the context processors render_template runs are not needed
+    return current_app.jinja_env.get_template(name)
+
+
+@functools.lru_cache(maxsize=1)
+def _empty_listing():
+    return _template('listBK.html').render(data={'listicle': []})
+
+
+def _listing_batches(list_of_files, paired, species, depth, in_home):
+    collect_files = []
+    append = collect_files.append
+    for entry in list_of_files:
+        item = entry.name
+        # flag-guarded tests first; at the species level most entries stop at the first one
+        if depth == 2 and item not in species:
             continue
-        if path.count('/') == 2 and item not in htmlGenerator.available_species(osfolder):
+        if in_home and item.endswith(('lost+found', 'data')):
             continue
-        if path.count('/') > 2 and path.split('/')[2] not in htmlGenerator.available_species(osfolder):
+        if '.git' in item:
             continue
-        if os.path.isdir(osfolder + path + item) or os.path.isfile(osfolder + path + item+'.pickle'):
-            collect_files += '<li><a href="' + item + '/">' + item + '</a></li>'
+        if entry.is_dir() or item in paired:
+            append(_LINK_ITEM % (item, item))
         else:
-            collect_files += '<li>' + item + '</li>'
+            append(_PLAIN_ITEM % item)
+        if len(collect_files) == _STREAM_BATCH:
+            yield Markup(''.join(collect_files))
+            collect_files.clear()
+    if collect_files:
+        yield Markup(''.join(collect_files))
+
 
-    return render_template('listBK.html', data={'listicle': Markup(collect_files)})
+def file_list(osfolder, path):
+    species = htmlGenerator.available_species(osfolder)
+    depth = path.count('/')
+    in_home = path == 'home/'
+    if depth > 2 and path.split('/')[2] not in species:
+        # everything below a folder that is not a known species is hidden
+        return _empty_listing()
+    with os.scandir(osfolder + path) as entries:
+        list_of_files = sorted(entries, key=lambda entry: entry.name)
+    # names that have a .pickle next to them, i.e. recordings that can be labelled
+    paired = {entry.name[:-7] for entry in list_of_files if entry.name.endswith('.pickle')}
+    batches = _listing_batches(list_of_files, paired, species, depth, in_home)
+    if len(list_of_files) > _STREAM_THRESHOLD:
+        return Response(stream_with_context(_template('listBK.html').generate(data={'listicle': batches})))
+    batches = list(batches)
+    if not batches:
+        return _empty_listing()
+    return _template('listBK.html').render(data={'listicle': batches})
@@ -1,11 +1,21 @@
 import DataReader
-import pickle
+import SegmentReader
+import numpy as np
+
+
+def call_bounds(onsets, offsets, fs, hwin, length):
+    # sample window of one call, or of every call at once when given the onset/offset arrays
+    pad = fs * hwin // 1000
+    start = np.maximum(np.multiply(onsets, fs).astype(np.int64) - pad, 0)
+    end = np.minimum(np.multiply(offsets, fs).astype(np.int64) + pad, length)
+    return start, end
+
+
 def get_audio_bit(path_to_file, call_to_do, hwin):
-    audiodata, fs, hashof = DataReader.DataReader.data_read(path_to_file)
-    with open(path_to_file + '.pickle', 'rb') as pfile:
-        segment_data = pickle.load(pfile)
-    onset = int(segment_data['onsets'][call_to_do] * fs)
-    offset = int(segment_data['offsets'][call_to_do] * fs)
+    audiodata, fs, hashof, scale = DataReader.DataReader.data_read(path_to_file)
+    segment_data = SegmentReader.SegmentReader.segment_read(path_to_file)
+    start, end = call_bounds(segment_data['onsets'][call_to_do], segment_data['offsets'][call_to_do],
+                             fs, hwin, audiodata.shape[0])
 
-    thr_x1 = audiodata[max(0, onset - (fs * hwin // 1000)):min(offset + (fs * hwin // 1000), len(audiodata)), :]
+    thr_x1 = np.multiply(audiodata[start:end], scale, dtype=np.float32)
     return thr_x1, fs, hashof
@@ -1,42 +1,50 @@
-import pickle
-import urllib
-import GetAudioBit
+import urllib.parse
+import DataReader
+import SegmentReader
 import os
-from flask import render_template, Markup
+import numpy as np
+from flask import current_app, render_template, Markup, Response, stream_with_context
 
+_CELL = "<td><img width=400 height=300 src='%s' /><br /><center>" \
+        "<input type='checkbox' id='%s' name='%s' value='%s'><br /></td>"
+_ROW_BREAK = '</tr><tr>'
+# pages with more calls than this are streamed so the browser starts on the images early
+_STREAM_THRESHOLD = 300
+_STREAM_BATCH = 48
 
-def get_listing(path_to_file, osfolder, path):
-    with open(os.sep + os.sep.join(path_to_file.split('/')[:-1]) + '.pickle', 'rb') as pfile:
-        segment_data = pickle.load(pfile)
-        collector = ''
-        counter = 0
-        for idx in range(len(segment_data['labels'])):
-            if not segment_data['labels'][idx]['type_call'] == path_to_file.split('/')[-1][:-12]:
-                continue
-            thr_x1, _, hashof = GetAudioBit.get_audio_bit(osfolder + os.sep.join(path.split('/')[:-1]), idx, 0)
 
-            def spectr_particle_fun(_channel, _overview):
+def _review_cells(matching, img_head, img_tail):
+    collector = []
+    for counter, idx in enumerate(matching):
+        if counter % 3 == 0 and counter > 0:
+            collector.append(_ROW_BREAK)
+        particle = 'call_' + str(idx)
+        collector.append(_CELL % (img_head + str(idx) + img_tail, particle, particle, particle))
+        if len(collector) >= _STREAM_BATCH:
+            yield Markup(''.join(collector))
+            collector.clear()
+    if collector:
+        yield Markup(''.join(collector))
 
-                args = {'hash': hashof,
-                        'call': idx,
-                        'channel': _channel,
-                        'overview': _overview,
-                        'contrast': 1,
-                        'numcalls': len(segment_data['offsets'])}
-                return '/img/' + path_to_file + 'spectrogram.png?' + urllib.parse.urlencode(args)
 
-            if counter % 3 == 0 and counter > 0:
-                collector += '</tr><tr>'
-            counter += 1
-            particle = 'call_' + str(idx)
-            collector += "<td><img width=400 height=300 src='" \
-                         + spectr_particle_fun(1, False) \
-                         + "' /><br /><center><input type='checkbox' id='"\
-                         + particle \
-                         + "' name='"\
-                         + particle\
-                         + "' value='"\
-                         + particle\
-                         + "'><br /></td>"
-        return render_template('AngieBK_review.html', data={'title': path_to_file.split('/')[-1][:-12],
-                                                            'output':Markup(collector)})
+def get_listing(path_to_file, osfolder, path):
+    recording = os.path.dirname(path_to_file)
+    segment_data = SegmentReader.SegmentReader.segment_read(recording)
+    type_call = os.path.basename(path_to_file)[:-12]
+    type_calls = SegmentReader.SegmentReader.type_calls(recording)
+    matching = np.flatnonzero(type_calls == type_call).tolist()
+    audio_path = osfolder + os.path.dirname(path).replace('/', os.sep)
+    if not matching:
+        return render_template('AngieBK_review.html', data={'title': type_call, 'output': []})
+    # the hash is of the whole recording; no call window needs to be cut out to get it
+    _, _, hashof, _ = DataReader.DataReader.data_read(audio_path)
+    # query keys keep the order urlencode produced: hash, call, channel, overview, contrast, numcalls
+    img_head = '/img/' + path_to_file + 'spectrogram.png?' + urllib.parse.urlencode({'hash': hashof}) + '&call='
+    img_tail = '&channel=1&overview=False&' + urllib.parse.urlencode({'contrast': 1,
+                                                                     'numcalls': len(segment_data['offsets'])})
+    cells = _review_cells(matching, img_head, img_tail)
+    if len(matching) > _STREAM_THRESHOLD:
+        template = current_app.jinja_env.get_template('AngieBK_review.html')
+        return Response(stream_with_context(template.generate(data={'title': type_call, 'output': cells})))
+    return render_template('AngieBK_review.html', data={'title': type_call,
+                                                        'output': list(cells)})
@@ -1,36 +1,43 @@
-import pickle
 from flask import render_template, Markup
 import htmlGenerator as hG
 import GetAudioBit
+import SegmentReader
 import os
 import urllib.parse
-import random
-import numpy as np
-import subprocess
+import RClient
+import DataReader
+import functools
 
 R = False
 
+
+@functools.lru_cache(maxsize=4096)
+def _classify(hashof, audio_path, onset, offset):
+    # keyed on the file hash as well, so a replaced recording is classified afresh
+    output = RClient.RClient.forward_pass(audio_path, onset, offset)
+    return output[-3][4:], float(output[-1][4:])
+
+
+def _particle_url(head, channel, middle, overview, tail):
+    return head + str(channel) + middle + str(overview) + tail
+
+
 def get_task(path_to_file, path, user_setting, osfolder, undo=False):
-    with open(path_to_file + '.pickle', 'rb') as pfile:
-        segment_data = pickle.load(pfile)
+    segment_data = SegmentReader.SegmentReader.segment_read(path_to_file)
     call_to_do = len(segment_data['labels'])
+    audio_path = osfolder + os.path.dirname(path).replace('/', os.sep)
     if undo:
         popped = segment_data['labels'].pop()
         assumed_answer = popped['type_call']
-        with open(path_to_file + '.pickle', 'wb') as pfile:
-            pickle.dump(segment_data, pfile)
+        SegmentReader.SegmentReader.segment_write(path_to_file, segment_data)
         confidence = -1
     else:
         if R:
-            returnvalue = subprocess.run("/usr/bin/Rscript --vanilla Forwardpass.R "
-                                          + osfolder
-                                          + os.sep.join(path.split('/')[:-1])
-                                          + ' '
-                                          + str(segment_data['onsets'][call_to_do])
-                                          + ' '
-                                          + str(segment_data['offsets'][call_to_do]), shell=True,  capture_output=True)
-            assumed_answer = returnvalue.stdout.splitlines()[-3][4:].decode()
-            confidence = float(returnvalue.stdout.splitlines()[-1][4:])
+            _, _, hashof, _ = DataReader.DataReader.data_read(audio_path)
+            assumed_answer, confidence = _classify(hashof,
+                                                   audio_path,
+                                                   segment_data['onsets'][call_to_do],
+                                                   segment_data['offsets'][call_to_do])
         else:
             assumed_answer = 'Echo'
             confidence = 50.0
@@ -41,42 +48,34 @@ def get_task(path_to_file, path, user_setting, osfolder, undo=False):
     if call_to_do > 0:
         backfragment = Markup('<a href="/battykoda/back/'+path+'">Undo</a>')
     txtsp, jpgsp = hG.spgather(path, osfolder, assumed_answer)
-    thr_x1, _, hashof = GetAudioBit.get_audio_bit(osfolder + os.sep.join(path.split('/')[:-1]), call_to_do, 0)
+    thr_x1, _, hashof = GetAudioBit.get_audio_bit(audio_path, call_to_do, 0)
     idx_main = min(int(user_setting['main']), thr_x1.shape[1])-1
 
-    def spectr_particle_fun(_channel, _overview):
-        args = {'hash': hashof,
-                'call': call_to_do,
-                'channel': _channel,
-                'overview': _overview,
-                'contrast': user_setting['contrast'],
-                'numcalls': len(segment_data['offsets'])}
-        return '/img/' + path + 'spectrogram.png?' + urllib.parse.urlencode(args)
-
-    def audio_particle_fun(_channel, _overview):
-        args = {'hash': hashof,
-                'channel': _channel,
-                'call': call_to_do,
-                'overview': _overview,
-                'loudness': user_setting['loudness']}
-        return '/audio/' + path + 'snippet.wav?' + urllib.parse.urlencode(args)
-    others = np.setdiff1d(range(thr_x1.shape[1]), idx_main)
-    other_html = ['<p><img src="'+spectr_particle_fun(other, _overview=False)+'" width="600" height="250" >' +
-                  '<audio controls src="' + audio_particle_fun(other, _overview=False) + '" preload="none" />' +
-                  '</p>' for other in others]
-    data = {'spectrogram': spectr_particle_fun(idx_main, _overview=False),
-            'spectrogram_large': spectr_particle_fun(idx_main, _overview=True),
+    # fixed parts of the query strings, in the key order the browser cache has already seen
+    spectr_head = '/img/' + path + 'spectrogram.png?' + urllib.parse.urlencode({'hash': hashof,
+                                                                                 'call': call_to_do}) + '&channel='
+    spectr_tail = '&' + urllib.parse.urlencode({'contrast': user_setting['contrast'],
+                                                'numcalls': len(segment_data['offsets'])})
+    audio_head = '/audio/' + path + 'snippet.wav?' + urllib.parse.urlencode({'hash': hashof}) + '&channel='
+    audio_middle = '&call=' + str(call_to_do) + '&overview='
+    audio_tail = '&' + urllib.parse.urlencode({'loudness': user_setting['loudness']})
+    others = [other for other in range(thr_x1.shape[1]) if other != idx_main]
+    other_channels = [{'spectrogram': _particle_url(spectr_head, other, '&overview=', False, spectr_tail),
+                       'audio': _particle_url(audio_head, other, audio_middle, False, audio_tail)}
+                      for other in others]
+    data = {'spectrogram': _particle_url(spectr_head, idx_main, '&overview=', False, spectr_tail),
+            'spectrogram_large': _particle_url(spectr_head, idx_main, '&overview=', True, spectr_tail),
             'confidence': confidence,
             'currentcall': call_to_do,
             'totalcalls': len(segment_data['offsets']),
             'backlink': backfragment,
-            'audiolink': audio_particle_fun(idx_main, _overview=False),
-            'long_audiolink': audio_particle_fun(idx_main, _overview=True),
+            'audiolink': _particle_url(audio_head, idx_main, audio_middle, False, audio_tail),
+            'long_audiolink': _particle_url(audio_head, idx_main, audio_middle, True, audio_tail),
             'species': Markup(txtsp),
             'jpgname': jpgsp,
             'focused': assumed_answer,
             'main': idx_main+1,
             'max_main': thr_x1.shape[1],
-            'others': Markup(''.join(other_html)),
+            'others': other_channels,
             }
     return render_template('AngieBK.html', data={**user_setting, **data})
@@ -2,6 +2,7 @@ import matplotlib.pyplot as plt
 import matplotlib
 import GetAudioBit
 import os
+import functools
 import scipy.signal
 import numpy as np
 import SoftCreateFolders
@@ -11,30 +12,54 @@ import Hwin
 # https://stackoverflow.com/questions/2801882/generating-a-png-with-matplotlib-when-display-is-undefined
 matplotlib.use('Agg')
 
-def plotting(path, args, event, osfolder):
-    event.wait()
+
+@functools.lru_cache(maxsize=1)
+def _spectrogram_axes():
+    # one figure per worker process, redrawn with each call's data instead of rebuilt
+    figure = plt.figure(facecolor='black')
+    ax = figure.add_subplot()
+    ax.set_facecolor('indigo')
+    image = ax.imshow(np.zeros((2, 2)), aspect='auto', origin='lower')
+    ax.tick_params(axis='x', colors='white')
+    ax.tick_params(axis='y', colors='white')
+    ax.xaxis.label.set_color('white')
+    ax.yaxis.label.set_color('white')
+    ax.set_ylabel('Frequency [Hz]')
+    ax.set_xlabel('Time [sec]')
+    return figure, ax, image
+
+
+def plotting(path, args, osfolder):
     overview = args['overview'] == 'True'
     hwin = Hwin.overview_hwin if overview else Hwin.normal_hwin
     call_to_do = int(args['call'])
     contrast = float(args['contrast'])
-    thr_x1, fs, hashof = GetAudioBit.get_audio_bit(osfolder + os.sep.join(path.split('/')[:-1]), call_to_do, hwin)
+    thr_x1, fs, hashof = GetAudioBit.get_audio_bit(osfolder + os.path.dirname(path).replace('/', os.sep), call_to_do, hwin)
     thr_x1 = thr_x1[:, int(args['channel'])]
     assert args['hash'] == hashof
     f, t, sxx = scipy.signal.spectrogram(thr_x1, fs, nperseg=2 ** 8, noverlap=254, nfft=2 ** 8)
-    plt.figure(facecolor='black')
-    ax = plt.axes()
-    ax.set_facecolor('indigo')
+    figure, ax, image = _spectrogram_axes()
     temocontrast = 10 ** contrast
-    plt.pcolormesh(t, f, np.arctan(temocontrast * sxx), shading='auto')
-    if not overview:
-        plt.xlim(0, 0.050)
-    ax.tick_params(axis='x', colors='white')
-    ax.tick_params(axis='y', colors='white')
-    ax.xaxis.label.set_color('white')
-    ax.yaxis.label.set_color('white')
-    plt.ylabel('Frequency [Hz]')
-    plt.xlabel('Time [sec]')
+    level = np.arctan(np.multiply(sxx, temocontrast, out=sxx), out=sxx)
+    low, high = level.min(), level.max()
+    # quantize to the colormap's 256 entries here, as autoscaling would, so matplotlib only handles bytes
+    level -= low
+    level *= 256 / (high - low) if high > low else 0
+    image.set_data(np.minimum(level, 255, out=level).astype(np.uint8))
+    image.set_clim(0, 255)
+    # cell edges as pcolormesh placed them: half a step either side of each bin centre
+    half_t = (2 ** 8 - 254) / fs / 2
+    half_f = fs / 2 ** 8 / 2
+    extent = (t[0] - half_t, t[-1] + half_t, f[0] - half_f, f[-1] + half_f)
+    image.set_extent(extent)
+    if overview:
+        ax.set_xlim(extent[0], extent[1])
+    else:
+        ax.set_xlim(0, 0.050)
+    ax.set_ylim(extent[2], extent[3])
     SoftCreateFolders.soft_create_folders(appropriate_file(path, args, osfolder, folder_only=True))
-    plt.savefig(appropriate_file(path, args, osfolder))
-    plt.close()
-
+    # written next to the target and renamed, so a half-written image is never on disk under its real name
+    target = appropriate_file(path, args, osfolder)
+    partial = target + '.' + str(os.getpid())
+    figure.savefig(partial, format='png')
+    os.replace(partial, target)
@@ -0,0 +1,72 @@
+import os
+import queue
+import subprocess
+import threading
+
+
+class RClient:
+    # long-lived R sessions that re-run Forwardpass.R per call, instead of starting Rscript every time;
+    # up to one per core, started on first need and handed out from the idle queue
+    command = ['/usr/bin/R', '--vanilla', '--no-echo']
+    script = 'Forwardpass.R'
+    sentinel = '__battykoda_done__'
+    pool_size = os.cpu_count() or 1
+    idle = queue.LifoQueue()
+    started = 0
+    lock = threading.Lock()
+
+    @classmethod
+    def quote(cls, value):
+        return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+    @classmethod
+    def session_start(cls):
+        return subprocess.Popen(cls.command,
+                                stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL,
+                                text=True,
+                                bufsize=1)
+
+    @classmethod
+    def session_get(cls):
+        with cls.lock:
+            start = cls.idle.empty() and cls.started < cls.pool_size
+            if start:
+                cls.started += 1
+        if not start:
+            process = cls.idle.get()
+            if process.poll() is None:
+                return process
+            # the session died since its last call; its slot goes to the replacement
+        try:
+            return cls.session_start()
+        except OSError:
+            with cls.lock:
+                cls.started -= 1
+            raise
+
+    @classmethod
+    def forward_pass(cls, *args):
+        # the script still reads its arguments through commandArgs() and prints its results as under Rscript;
+        # try() keeps an error in one call from ending the session
+        request = ('commandArgs <- function(trailingOnly = FALSE) c('
+                   + ', '.join(cls.quote(arg) for arg in args) + ')\n'
+                   + 'try(source(' + cls.quote(cls.script) + ', print.eval = TRUE))\n'
+                   + 'cat("' + cls.sentinel + '\\n"); flush(stdout())\n')
+        lines = []
+        process = cls.session_get()
+        try:
+            process.stdin.write(request)
+            process.stdin.flush()
+            for line in process.stdout:
+                line = line.rstrip('\n')
+                if line.endswith(cls.sentinel):
+                    # output that did not end in a newline shares the sentinel's line
+                    if line != cls.sentinel:
+                        lines.append(line[:-len(cls.sentinel)])
+                    break
+                lines.append(line)
+        finally:
+            cls.idle.put(process)
+        return lines
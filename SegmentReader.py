@@ -0,0 +1,61 @@
+import pickle
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+class SegmentReader:
+    # least recently used first; entries are checked against the pickle's size and mtime on every read
+    cache = OrderedDict()
+    cache_lock = threading.Lock()
+    cache_max_entries = 64
+
+    @classmethod
+    def cache_store(cls, path_to_file, version, segment_data):
+        with cls.cache_lock:
+            cls.cache[path_to_file] = {'version': version,
+                                       'segment_data': segment_data}
+            cls.cache.move_to_end(path_to_file)
+            while len(cls.cache) > cls.cache_max_entries:
+                cls.cache.popitem(last=False)
+
+    @classmethod
+    def segment_copy(cls, segment_data):
+        # callers append, pop and replace labels; they get their own list so the cached one only changes on save
+        return dict(segment_data, labels=list(segment_data['labels']))
+
+    @classmethod
+    def segment_read(cls, path_to_file):
+        stat = os.stat(path_to_file + '.pickle')
+        version = (stat.st_size, stat.st_mtime_ns)
+        with cls.cache_lock:
+            entry = cls.cache.get(path_to_file)
+            if entry is not None and entry['version'] == version:
+                cls.cache.move_to_end(path_to_file)
+                return cls.segment_copy(entry['segment_data'])
+        with open(path_to_file + '.pickle', 'rb') as pfile:
+            segment_data = pickle.load(pfile)
+        cls.cache_store(path_to_file, version, segment_data)
+        return cls.segment_copy(segment_data)
+
+    @classmethod
+    def type_calls(cls, path_to_file):
+        # label types as one array, decoded once per version of the pickle
+        segment_data = cls.segment_read(path_to_file)
+        with cls.cache_lock:
+            entry = cls.cache.get(path_to_file)
+        if entry is None:
+            return np.array([label['type_call'] for label in segment_data['labels']], dtype=str)
+        if 'type_calls' not in entry:
+            entry['type_calls'] = np.array([label['type_call'] for label in entry['segment_data']['labels']],
+                                           dtype=str)
+        return entry['type_calls']
+
+    @classmethod
+    def segment_write(cls, path_to_file, segment_data):
+        with open(path_to_file + '.pickle', 'wb') as pfile:
+            pickle.dump(segment_data, pfile, protocol=pickle.HIGHEST_PROTOCOL)
+        # write-through once the dump has succeeded, so the next read does not unpickle what was just written
+        stat = os.stat(path_to_file + '.pickle')
+        cls.cache_store(path_to_file, (stat.st_size, stat.st_mtime_ns), cls.segment_copy(segment_data))
@@ -1,5 +1,5 @@
 import os
-def soft_create_folders(newpath):
-    if not os.path.exists(newpath):
-        os.makedirs(newpath)
 
+
+def soft_create_folders(newpath):
+    os.makedirs(newpath, exist_ok=True)
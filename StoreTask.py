@@ -1,12 +1,10 @@
-import pickle
 import csv
+import SegmentReader
 def store_task(path_to_file, result):
 
-    with open(path_to_file + '.pickle', 'rb') as pfile:
-        segment_data = pickle.load(pfile)
+    segment_data = SegmentReader.SegmentReader.segment_read(path_to_file)
     segment_data['labels'].append(result)
-    with open(path_to_file+'.pickle', 'wb') as pfile:
-        pickle.dump(segment_data, pfile)
+    SegmentReader.SegmentReader.segment_write(path_to_file, segment_data)
 
     data = []
     data_pre = segment_data
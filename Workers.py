@@ -1,5 +1,13 @@
 from AppropriateFile import appropriate_file
+import os
+import time
 import threading
+import functools
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import DataReader
 from Plotting import plotting
 from dataclasses import dataclass, field
 from typing import Any
@@ -11,26 +19,120 @@ class PrioItem:
     item: Any = field(compare=False)
 
 
+# handed out when the image is already on disk
+finished = Future()
+finished.set_result(None)
+
+storage_max = 512
+pool_size = os.cpu_count() or 1
+# how long a folder listing answers existence checks before it is read again
+dir_ttl = 2
+
+
+def plot_init(disk_cache_folder):
+    DataReader.DataReader.disk_cache_folder = disk_cache_folder
+    # the server process prefetches the next recording; plotting processes only read what they draw
+    DataReader.DataReader.prefetch_depth = 0
+
+
+def relay(future, slots, job):
+    slots.release()
+    if job.exception() is None:
+        future.set_result(None)
+    else:
+        future.set_exception(job.exception())
+
+
+def on_disk(dir_cache, key):
+    folder, name = os.path.split(key)
+    now = time.monotonic()
+    scanned = dir_cache.get(folder)
+    if scanned is None or now - scanned[0] > dir_ttl:
+        try:
+            with os.scandir(folder) as entries:
+                scanned = (now, {entry.name for entry in entries})
+        except OSError:
+            # missing or unreadable folder: nothing counts as on disk, and the plot fails in its own future
+            scanned = (now, set())
+        dir_cache[folder] = scanned
+        if len(dir_cache) > storage_max:
+            for stale in [old for old, (when, _) in dir_cache.items() if now - when > dir_ttl]:
+                del dir_cache[stale]
+    return name in scanned[1]
+
+
+def mark_written(dir_cache, key, future):
+    folder, name = os.path.split(key)
+    scanned = dir_cache.get(folder)
+    if future.exception() is None and scanned is not None:
+        scanned[1].add(name)
+
+
 def worker(request_queue, work_queue, osfolder):
-    mythreadstorage = {}
+    # pending and recent plots by output file, oldest first; only finished ones are dropped
+    mythreadstorage = OrderedDict()
+    # file names per temp folder, so variants of one call cost a single directory read
+    dir_cache = {}
     while True:
         pi = request_queue.get()
-        key = appropriate_file(pi.item['path'], pi.item['args'], osfolder)
-        if key not in mythreadstorage:
-            event = threading.Event()
-            thread = threading.Thread(target=plotting,
-                                      args=(pi.item['path'], pi.item['args'], event, osfolder),
-                                      daemon=True)
-            thread.start()
-            mythreadstorage[key] = thread
-            work_queue.put(PrioItem(pi.priority, {'thread': thread, 'event': event}))
-        pi.item['thread'] = mythreadstorage[key]
+        try:
+            key = appropriate_file(pi.item['path'], pi.item['args'], osfolder)
+            if key in mythreadstorage and mythreadstorage[key].done() and mythreadstorage[key].exception() is not None:
+                # a failed plot is tried again rather than failing every later request for it
+                del mythreadstorage[key]
+            if key in mythreadstorage:
+                mythreadstorage.move_to_end(key)
+                pi.item['future'] = mythreadstorage[key]
+            elif on_disk(dir_cache, key):
+                pi.item['future'] = finished
+            else:
+                future = Future()
+                future.add_done_callback(functools.partial(mark_written, dir_cache, key))
+                mythreadstorage[key] = future
+                pi.item['future'] = future
+                work_queue.put(PrioItem(pi.priority, {'future': future,
+                                                      'path': pi.item['path'],
+                                                      'args': pi.item['args'],
+                                                      'osfolder': osfolder}))
+                if len(mythreadstorage) > storage_max:
+                    for done in [old for old, old_future in mythreadstorage.items() if old_future.done()]:
+                        del mythreadstorage[done]
+                        if len(mythreadstorage) <= storage_max:
+                            break
+        except Exception as error:
+            # a bad request fails on its own; this thread keeps serving the rest
+            if 'future' not in pi.item:
+                pi.item['future'] = Future()
+                pi.item['future'].set_exception(error)
         request_queue.task_done()
 
 
+def plot_pool():
+    # spawn rather than fork because the server is already threaded by the time this starts
+    return ProcessPoolExecutor(max_workers=pool_size,
+                               mp_context=multiprocessing.get_context('spawn'),
+                               initializer=plot_init,
+                               initargs=(DataReader.DataReader.disk_cache_folder,))
+
+
 def worker2(work_queue):
+    # plots run in parallel, one per core, and are started in priority order as slots free up
+    pool = plot_pool()
+    slots = threading.Semaphore(pool_size)
     while True:
         item = work_queue.get().item
-        item['event'].set()
-        item['thread'].join()
+        slots.acquire()
+        try:
+            try:
+                job = pool.submit(plotting, item['path'], item['args'], item['osfolder'])
+            except BrokenProcessPool:
+                # a pool process died (e.g. killed for memory); start a fresh pool and try once more
+                pool.shutdown(wait=False)
+                pool = plot_pool()
+                job = pool.submit(plotting, item['path'], item['args'], item['osfolder'])
+        except Exception as error:
+            slots.release()
+            item['future'].set_exception(error)
+        else:
+            job.add_done_callback(functools.partial(relay, item['future'], slots))
         work_queue.task_done()
@@ -30,4 +30,4 @@ for idx in range(excel_data.shape[0]):
 
 for key in todos:
     with open(key + '.pickle', 'wb') as pfile:
-        pickle.dump({'onsets': (np.array(todos[key]) + 0.0).tolist(), 'offsets': (np.array(todos[key]) + 0.01).tolist(), 'labels': []}, pfile)
+        pickle.dump({'onsets': (np.array(todos[key]) + 0.0).tolist(), 'offsets': (np.array(todos[key]) + 0.01).tolist(), 'labels': []}, pfile, protocol=pickle.HIGHEST_PROTOCOL)
@@ -1,20 +1,36 @@
 import os
+import functools
 
 static_folder = 'home/data/battykoda/static/'
 
 
 def available_species(osfolder):
-   prelist = os.listdir(osfolder + static_folder)
+   # the folder's mtime changes when a species file is added or removed, which invalidates the cache
+   return _available_species(osfolder + static_folder, os.stat(osfolder + static_folder).st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=8)
+def _available_species(folder, mtime_ns):
+   prelist = os.listdir(folder)
    finallist = []
    for item in prelist:
       if item.endswith('.txt'):
          finallist.append(item[:-4])
-   return finallist
+   return frozenset(finallist)
+
+
 def spgather(wholepath,osfolder, assumed_answer):
    species=wholepath.split('/')[2]
+   txtname = osfolder + static_folder + species + '.txt'
+   # keyed on the species file's mtime as well, so edits to the call list show up straight away
+   return _spgather(txtname, species, assumed_answer, os.stat(txtname).st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=256)
+def _spgather(txtname, species, assumed_answer, mtime_ns):
    jpgname='/static/'+species+'.jpg'
 
-   f = open(osfolder + static_folder + species + '.txt')
+   f = open(txtname)
    lines = f.readlines()
    f.close()
    collectstrings=''
@@ -27,7 +43,3 @@ def spgather(wholepath,osfolder, assumed_answer):
       collectstrings+=radiobutton
 
    return collectstrings, jpgname
-
-
-
-
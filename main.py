@@ -2,7 +2,6 @@ import os
 from flask import Flask, render_template, request, send_file
 import scipy.signal
 import scipy.io
-from os.path import exists
 import FileList
 import GetAudioBit
 import platform
@@ -11,18 +10,20 @@ import queue
 import SoftCreateFolders
 import StoreTask
 import GetTask
-from AppropriateFile import appropriate_file
+from AppropriateFile import appropriate_file, temp_folder
+import DataReader
 import Workers
 import Hwin
 import htmlGenerator
 import GetListing
+import SegmentReader
 from datetime import datetime
-import pickle
 import csv
 osfolder = '/'
 computer = platform.uname()
 if computer.system == 'Windows':
     osfolder = '.\\data\\'
+DataReader.DataReader.disk_cache_folder = osfolder + temp_folder + 'datareader'
 
 app = Flask(__name__, static_folder=osfolder + htmlGenerator.static_folder)
 global_user_setting = {'limit_confidence': '90',
@@ -61,17 +62,15 @@ def handle_batty(path):
         return FileList.file_list(osfolder, path)
     if path.endswith('review.html'):
         if request.method == 'POST':
-            path_to_file = osfolder + '/'.join(path.split('/')[:-1])
-            with open(path_to_file + '.pickle', 'rb') as pfile:
-                segment_data = pickle.load(pfile)
-            type_c = path.split('/')[-1][:-12]
+            path_to_file = osfolder + os.path.dirname(path)
+            segment_data = SegmentReader.SegmentReader.segment_read(path_to_file)
+            type_c = os.path.basename(path)[:-12]
             for idx in range(len(segment_data['labels'])):
                 if segment_data['labels'][idx]['type_call'] == type_c:
                     if 'call_' + str(idx) in request.form:
                         segment_data['labels'][idx] = dict(segment_data['labels'][idx])
                         segment_data['labels'][idx]['type_call'] = 'Unsure'
-            with open(path_to_file + '.pickle', 'wb') as pfile:
-                pickle.dump(segment_data, pfile)
+            SegmentReader.SegmentReader.segment_write(path_to_file, segment_data)
             data_pre = segment_data
             data = []
             for idx in range(len(data_pre['onsets'])):
@@ -106,26 +105,31 @@ def handle_image(path):
         new_args['call'] = str(call_to_do+1)
         global_request_queue.put(Workers.PrioItem(4 + priority_part, {'path': path, 'args': new_args}))
     global_request_queue.join()
-    workload['thread'].join()
+    workload['future'].result()
     return send_file(appropriate_file(path, request.args, osfolder))
 
 
 @app.route('/audio/<path:path>')
 def handle_sound(path):
     slowdown = 5
-    if not exists(appropriate_file(path, request.args, osfolder)):
-        SoftCreateFolders.soft_create_folders(appropriate_file(path, request.args, osfolder, folder_only=True))
-        call_to_do = int(request.args['call'])
-        overview = request.args['overview'] == 'True'
-        hwin = Hwin.overview_hwin if overview else Hwin.normal_hwin
-        thr_x1, fs, hashof = GetAudioBit.get_audio_bit(osfolder + os.sep.join(path.split('/')[:-1]), call_to_do, hwin)
-        thr_x1 = thr_x1[:, int(request.args['channel'])]
-        assert request.args['hash'] == hashof
-        scipy.io.wavfile.write(appropriate_file(path, request.args, osfolder),
-                               fs // slowdown,
-                               thr_x1.astype('float32').repeat(slowdown) * float(request.args['loudness']))
-
-    return send_file(appropriate_file(path, request.args, osfolder))
+    wav_file = appropriate_file(path, request.args, osfolder)
+    try:
+        # send_file stats the file up front, so a missing snippet is caught here
+        return send_file(wav_file)
+    except FileNotFoundError:
+        pass
+    SoftCreateFolders.soft_create_folders(appropriate_file(path, request.args, osfolder, folder_only=True))
+    call_to_do = int(request.args['call'])
+    overview = request.args['overview'] == 'True'
+    hwin = Hwin.overview_hwin if overview else Hwin.normal_hwin
+    thr_x1, fs, hashof = GetAudioBit.get_audio_bit(osfolder + os.path.dirname(path).replace('/', os.sep), call_to_do, hwin)
+    thr_x1 = thr_x1[:, int(request.args['channel'])]
+    assert request.args['hash'] == hashof
+    scipy.io.wavfile.write(wav_file,
+                           fs // slowdown,
+                           thr_x1.astype('float32').repeat(slowdown) * float(request.args['loudness']))
+
+    return send_file(wav_file)
 
 
 if __name__ == '__main__':